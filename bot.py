@@ -4,10 +4,16 @@ AuraDent Bot - Telegram bot for handling dental consultation requests
 """
 
 import os
+import atexit
+import asyncio
 import logging
-import json
-from datetime import datetime
-from typing import Dict, Any, Optional
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from io import BytesIO
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 from telegram import Update, ForceReply
@@ -19,8 +25,11 @@ from telegram.ext import (
     filters
 )
 from dotenv import load_dotenv
+import orjson
 import openpyxl
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from openpyxl.styles import Font, Alignment
 
 # Load environment variables
@@ -35,93 +44,281 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 # Webhook configuration for cloud hosting
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 PORT = int(os.getenv('PORT', 8443))
-WEBHOOK_PATH = f"/{BOT_TOKEN}"
 
-# Setup logging
+# Format used for all human-readable timestamps
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Longest consultation message accepted (Telegram's own text message limit)
+MAX_MESSAGE_LENGTH = 4096
+
+# Maximum number of queued consultations written to disk at once
+WRITE_BATCH_SIZE = 50
+
+# Consultation fields, in storage and export order:
+# (database column, database type, Excel header, consultation data key).
+# The timestamp has no data key; it is filled in when the row is built.
+# Columns added here are added to existing databases on startup.
+CONSULTATION_COLUMNS = (
+    ('timestamp', 'TEXT', "Timestamp", None),
+    ('name', 'TEXT', "Name", 'name'),
+    ('phone', 'TEXT', "Phone", 'phone'),
+    ('email', 'TEXT', "Email", 'email'),
+    ('age', 'TEXT', "Age", 'age'),
+    ('consultation_type', 'TEXT', "Consultation Type", 'consultation_type'),
+    ('message', 'TEXT', "Message", 'message'),
+    ('chat_id', 'INTEGER', "Chat ID", 'chat_id'),
+)
+
+EXCEL_HEADERS = [header for _, _, header, _ in CONSULTATION_COLUMNS]
+
+# SQL built from CONSULTATION_COLUMNS so the column order is defined once
+_DB_COLUMNS = ', '.join(column for column, _, _, _ in CONSULTATION_COLUMNS)
+CREATE_TABLE_SQL = (
+    "CREATE TABLE IF NOT EXISTS consultations (id INTEGER PRIMARY KEY, "
+    + ', '.join(f"{column} {db_type}" for column, db_type, _, _ in CONSULTATION_COLUMNS)
+    + ")"
+)
+INSERT_SQL = (
+    f"INSERT INTO consultations ({_DB_COLUMNS}) "
+    f"VALUES ({', '.join('?' * len(CONSULTATION_COLUMNS))})"
+)
+SELECT_SQL = f"SELECT {_DB_COLUMNS} FROM consultations ORDER BY id"
+
+# Fixed column widths for the Excel export
+EXCEL_COLUMN_WIDTHS = {
+    'A': 20, 'B': 20, 'C': 15, 'D': 25,
+    'E': 6, 'F': 22, 'G': 40, 'H': 15
+}
+
+# Header cell styles, shared by every header cell of the export
+HEADER_FONT = Font(bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal='center')
+
+# Setup logging; unknown level names fall back to INFO
+LOG_LEVEL_NUM = logging.getLevelName(LOG_LEVEL.upper())
+if not isinstance(LOG_LEVEL_NUM, int):
+    LOG_LEVEL_NUM = logging.INFO
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=getattr(logging, LOG_LEVEL.upper())
+    level=LOG_LEVEL_NUM
 )
 logger = logging.getLogger(__name__)
 
+# Telegram ids are ints; a non-numeric value such as the .env.example
+# placeholder is treated as unset so /myid can still be used for setup
+try:
+    ADMIN_CHAT_ID = int(ADMIN_CHAT_ID) if ADMIN_CHAT_ID else None
+except ValueError:
+    logger.warning("ADMIN_CHAT_ID=%r is not a numeric Telegram ID, treating it as unset", ADMIN_CHAT_ID)
+    ADMIN_CHAT_ID = None
+
+
+def now_str(fmt: str = TIMESTAMP_FORMAT) -> str:
+    """Format the current local time without building a datetime object"""
+    return time.strftime(fmt, time.localtime())
+
 
 class ConsultationManager:
     """Manages consultation requests and Excel operations"""
     
     def __init__(self, excel_path: str):
         self.excel_path = Path(excel_path)
+        self.db_path = self.excel_path.with_suffix('.db')
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._exported_count: Optional[int] = None
+        self._xlsx_bytes: Optional[bytes] = None
+        self._disk_copy_count: Optional[int] = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        
+        # Consultations are stored in SQLite; the Excel file is only rebuilt
+        # from it when an export is requested. The connection is shared with
+        # the writer's executor threads and guarded by self._lock.
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(CREATE_TABLE_SQL)
+        self._add_missing_columns()
+        self.db.commit()
+        
+        self._count = self.db.execute("SELECT count(*) FROM consultations").fetchone()[0]
+        if not self._count:
+            self._import_legacy_data()
         self._ensure_excel_file_exists()
     
+    def _add_missing_columns(self) -> None:
+        """Add columns defined in CONSULTATION_COLUMNS that an older database lacks"""
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(consultations)")}
+        for column, db_type, _, _ in CONSULTATION_COLUMNS:
+            if column not in existing:
+                self.db.execute(f"ALTER TABLE consultations ADD COLUMN {column} {db_type}")
+                logger.info("Added column %s to %s", column, self.db_path)
+    
     def _ensure_excel_file_exists(self) -> None:
         """Create Excel file with headers if it doesn't exist"""
         if not self.excel_path.exists():
-            workbook = Workbook()
-            sheet = workbook.active
-            sheet.title = "Consultations"
-            
-            # Define headers
-            headers = [
-                "Timestamp", "Name", "Phone", "Email", 
-                "Age", "Consultation Type", "Message", "Chat ID"
-            ]
-            
-            # Add headers with formatting
-            for col, header in enumerate(headers, 1):
-                cell = sheet.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal='center')
-            
-            # Auto-adjust column widths
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                sheet.column_dimensions[column_letter].width = adjusted_width
-            
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet("Consultations")
+            sheet.append(EXCEL_HEADERS)
             workbook.save(self.excel_path)
-            logger.info(f"Created Excel file: {self.excel_path}")
+            logger.info("Created Excel file: %s", self.excel_path)
     
-    def add_consultation(self, consultation_data: Dict[str, Any]) -> bool:
-        """Add a new consultation to the Excel file"""
+    def _import_legacy_data(self) -> None:
+        """Seed the database from the Excel file written by older versions"""
+        if not self.excel_path.exists():
+            return
+        
+        workbook = openpyxl.load_workbook(self.excel_path, read_only=True, data_only=True)
+        rows = [
+            ['' if value is None else str(value) for value in row]
+            for row in workbook.active.iter_rows(min_row=2, values_only=True)
+        ]
+        workbook.close()
+        
+        # Pad or trim rows to the current columns
+        width = len(EXCEL_HEADERS)
+        rows = [(list(row) + [''] * width)[:width] for row in rows]
+        if rows:
+            imported = sum(self._flush_batch(rows))
+            logger.info("Imported %d existing consultations from %s into %s", imported, self.excel_path, self.db_path)
+    
+    def _build_row(self, consultation_data: Dict[str, Any], ts: Optional[str] = None) -> List[Any]:
+        """Map consultation data to Excel columns"""
+        # Add timestamp
+        timestamp = ts or now_str()
+        
+        row = [
+            timestamp if key is None else consultation_data.get(key, '')
+            for _, _, _, key in CONSULTATION_COLUMNS
+        ]
+        # JSON requests can carry numbers, lists or objects; store them as
+        # text so SQLite never rejects a value (e.g. integers beyond 64 bits)
+        return [value if isinstance(value, str) else str(value) for value in row]
+    
+    def _insert_rows(self, rows: List[List[Any]]) -> None:
+        """Insert rows in a single transaction"""
+        with self._lock:
+            with self.db:
+                self.db.executemany(INSERT_SQL, rows)
+            self._count += len(rows)
+    
+    def _flush_batch(self, rows: List[List[Any]]) -> List[bool]:
+        """Insert a batch of rows, returning whether each row was stored"""
         try:
-            workbook = openpyxl.load_workbook(self.excel_path)
-            sheet = workbook.active
-            
-            # Find next empty row
-            next_row = sheet.max_row + 1
-            
-            # Add timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Map data to columns
-            row_data = [
-                timestamp,
-                consultation_data.get('name', ''),
-                consultation_data.get('phone', ''),
-                consultation_data.get('email', ''),
-                consultation_data.get('age', ''),
-                consultation_data.get('consultation_type', ''),
-                consultation_data.get('message', ''),
-                consultation_data.get('chat_id', '')
-            ]
-            
-            # Add data to row
-            for col, value in enumerate(row_data, 1):
-                sheet.cell(row=next_row, column=col, value=value)
+            self._insert_rows(rows)
+            logger.info("Added %d consultation(s) to database", len(rows))
+            return [True] * len(rows)
+        except (sqlite3.Error, OverflowError) as e:
+            if len(rows) == 1:
+                logger.error("Error adding consultation to database: %s", e)
+                return [False]
+        
+        # One bad row rolls back the whole batch; retry the rows one at a time
+        # so the other consultations in it are still stored
+        return [self._flush_batch([row])[0] for row in rows]
+    
+    async def submit(self, consultation_data: Dict[str, Any], ts: Optional[str] = None) -> bool:
+        """Queue a consultation for the background writer and wait until it is stored"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((self._build_row(consultation_data, ts), future))
+        return await future
+    
+    async def _writer_loop(self) -> None:
+        """Drain the queue and write queued consultations in batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < WRITE_BATCH_SIZE:
+                try:
+                    items.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
             
-            workbook.save(self.excel_path)
-            logger.info(f"Added consultation to Excel: {consultation_data.get('name', 'Unknown')}")
-            return True
+            try:
+                results = await loop.run_in_executor(
+                    None, self._flush_batch, [row for row, _ in items]
+                )
+            except Exception as e:
+                # Keep the writer alive; these consultations are reported as failed
+                logger.error("Error writing consultation batch: %s", e)
+                results = [False] * len(items)
             
-        except Exception as e:
-            logger.error(f"Error adding consultation to Excel: {e}")
-            return False
+            for (_, future), success in zip(items, results):
+                if not future.done():
+                    future.set_result(success)
+                self.queue.task_done()
+    
+    def start_writer(self) -> None:
+        """Start the background writer task on the running event loop"""
+        self._writer_task = asyncio.create_task(self._writer_loop())
+    
+    async def stop_writer(self) -> None:
+        """Write any queued consultations and stop the background writer"""
+        if self._writer_task is None:
+            return
+        await self.queue.join()
+        self._writer_task.cancel()
+        self._writer_task = None
+    
+    def get_xlsx_bytes(self) -> bytes:
+        """Get the Excel export, rebuilding it only when consultations were added"""
+        # Concurrent exports would otherwise share the same temporary file
+        with self._export_lock:
+            if self._xlsx_bytes is None or self._exported_count != self._count:
+                self._build_export()
+            if self._disk_copy_count != self._exported_count:
+                self._write_disk_copy()
+            return self._xlsx_bytes
+    
+    def _build_export(self) -> None:
+        """Rebuild the in-memory Excel export from the database"""
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Consultations")
+        
+        for column_letter, width in EXCEL_COLUMN_WIDTHS.items():
+            sheet.column_dimensions[column_letter].width = width
+        
+        header_row = []
+        for header in EXCEL_HEADERS:
+            cell = WriteOnlyCell(sheet, value=header)
+            cell.font = HEADER_FONT
+            cell.alignment = HEADER_ALIGNMENT
+            header_row.append(cell)
+        sheet.append(header_row)
+        
+        # A separate read connection lets inserts continue while exporting (WAL)
+        exported_count = 0
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            for row in conn.execute(SELECT_SQL):
+                # openpyxl refuses control characters; drop them from the export
+                # only, so one such value can't break every later export
+                sheet.append([
+                    ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+                    for value in row
+                ])
+                exported_count += 1
+        
+        buffer = BytesIO()
+        workbook.save(buffer)
+        self._xlsx_bytes = buffer.getvalue()
+        self._exported_count = exported_count
+    
+    def _write_disk_copy(self) -> None:
+        """Save the cached export to the Excel file, retried on the next export if it fails"""
+        # Write next to the target and swap it in so readers never see a partial file
+        tmp_path = self.excel_path.with_suffix('.tmp')
+        try:
+            tmp_path.write_bytes(self._xlsx_bytes)
+            os.replace(tmp_path, self.excel_path)
+            self._disk_copy_count = self._exported_count
+        except OSError as e:
+            logger.error("Error saving Excel file %s: %s", self.excel_path, e)
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self.db.close()
     
     def get_excel_file_path(self) -> Path:
         """Get the path to the Excel file"""
@@ -129,17 +326,11 @@ class ConsultationManager:
     
     def get_consultation_count(self) -> int:
         """Get the total number of consultations"""
-        try:
-            workbook = openpyxl.load_workbook(self.excel_path)
-            sheet = workbook.active
-            return sheet.max_row - 1  # Subtract 1 for header row
-        except Exception as e:
-            logger.error(f"Error counting consultations: {e}")
-            return 0
+        return self._count
 
 
-# Initialize consultation manager
-consultation_manager = ConsultationManager(EXCEL_FILE_PATH)
+# Consultation manager, created in main() so importing this module has no disk side effects
+consultation_manager: Optional[ConsultationManager] = None
 
 
 def parse_consultation_message(message_text: str) -> Optional[Dict[str, Any]]:
@@ -153,82 +344,67 @@ def parse_consultation_message(message_text: str) -> Optional[Dict[str, Any]]:
     Message: Optional message (optional)
     Date: Optional date (optional)
     """
+    # Reject oversized input and text that can't hold any "key: value" pair
+    # (JSON objects need a colon too) before doing any parsing work
+    if len(message_text) > MAX_MESSAGE_LENGTH or ':' not in message_text:
+        return None
+    
     try:
-        # Try to parse as JSON first
-        if message_text.strip().startswith('{'):
-            return json.loads(message_text)
-        
-        # Check if it starts with "New Consultation Request"
-        lines = message_text.strip().split('\n')
-        
-        # Skip the first line if it's "New Consultation Request"
-        start_index = 0
-        if lines and lines[0].strip().lower() in ['new consultation request', 'consultation request']:
-            start_index = 1
+        # Try to parse as JSON first; look at the first non-blank character
+        # instead of stripping a copy of the whole message
+        i = 0
+        n = len(message_text)
+        while i < n and message_text[i] in ' \t\r\n':
+            i += 1
+        if i < n and message_text[i] == '{':
+            return orjson.loads(message_text)
         
+        # Scan "Key: value" lines in place; header lines like
+        # "New Consultation Request" have no colon and are skipped
         consultation_data = {}
-        
-        # Parse key-value pairs
-        for i in range(start_index, len(lines)):
-            line = lines[i].strip()
-            if ':' in line:
-                key, value = line.split(':', 1)
-                key = key.strip().lower()
-                value = value.strip()
-                
+        i = 0
+        n = len(message_text)
+        while i < n:
+            nl = message_text.find('\n', i)
+            if nl == -1:
+                nl = n
+            colon = message_text.find(':', i, nl)
+            if colon != -1:
+                value = message_text[colon + 1:nl].strip()
                 # Skip empty values
-                if not value:
-                    continue
-                
-                # Map keys to standardized names
-                key_mapping = {
-                    'name': 'name',
-                    'email': 'email', 
-                    'phone': 'phone',
-                    'message': 'message',
-                    'date': 'date',
-                    'consultation type': 'consultation_type',
-                    'age': 'age'
-                }
-                
-                mapped_key = key_mapping.get(key, key.replace(' ', '_'))
-                consultation_data[mapped_key] = value
+                if value:
+                    key = message_text[i:colon].strip().lower().replace(' ', '_')
+                    consultation_data[key] = value
+            i = nl + 1
         
         # Validate required fields (name, email, phone)
-        required_fields = ['name', 'email', 'phone']
-        if not all(field in consultation_data for field in required_fields):
-            logger.warning(f"Missing required fields in consultation: {consultation_data}")
+        if 'name' not in consultation_data or 'email' not in consultation_data or 'phone' not in consultation_data:
+            logger.warning("Missing required fields in consultation: %s", consultation_data)
             return None
         
         return consultation_data if consultation_data else None
         
-    except Exception as e:
-        logger.error(f"Error parsing consultation message: {e}")
+    except orjson.JSONDecodeError as e:
+        logger.error("Error parsing consultation message: %s", e)
         return None
 
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    await update.message.reply_html(
-        f"Hi {user.mention_html()}!\n\n"
-        f"🦷 Welcome to AuraDent Bot!\n\n"
-        f"This bot handles dental consultation requests. "
-        f"Send consultation data in the following format:\n\n"
-        f"<code>New Consultation Request\n"
-        f"Name: Eugeniu Buzila\n"
-        f"Email: eugeniubuzila11@gmail.com\n"
-        f"Phone: 3886356363\n"
-        f"Message: Your message here (optional)\n"
-        f"Date: Sat Oct 18 2025 (optional)</code>\n\n"
-        f"Admins can use /get_consultations to download the Excel file.",
-        reply_markup=ForceReply(selective=True),
-    )
-
+# Static bot messages, rendered once at import
+START_TEXT = (
+    "Hi {mention}!\n\n"
+    "🦷 Welcome to AuraDent Bot!\n\n"
+    "This bot handles dental consultation requests. "
+    "Send consultation data in the following format:\n\n"
+    "<code>New Consultation Request\n"
+    "Name: Eugeniu Buzila\n"
+    "Email: eugeniubuzila11@gmail.com\n"
+    "Phone: 3886356363\n"
+    "Message: Your message here (optional)\n"
+    "Date: Sat Oct 18 2025 (optional)</code>\n\n"
+    "Admins can use /get_consultations to download the Excel file."
+)
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /help is issued."""
-    help_text = """
+HELP_TEXT = """
 🦷 *AuraDent Bot Help*
 
 *Available Commands:*
@@ -264,16 +440,70 @@ Date: Sat Oct 18 2025 (optional)
 }
 ```
     """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+
+FORCE_REPLY = ForceReply(selective=True)
+
+USER_CONFIRM_TMPL = (
+    "✅ Consultation request received!\n\n"
+    "👤 Patient: {name}\n"
+    "📞 Phone: {phone}\n"
+    "📧 Email: {email}\n"
+    "{optional}"
+    "\nYour request has been saved and our team will contact you soon!"
+)
+
+ADMIN_NOTIF_TMPL = (
+    "🔔 *New Consultation Request*\n\n"
+    "👤 *Name:* {name}\n"
+    "📞 *Phone:* {phone}\n"
+    "📧 *Email:* {email}\n"
+    "{optional}"
+    "📱 *Chat ID:* {chat_id}\n"
+    "⏰ *Time:* {timestamp}"
+)
+
+# Lines for optional fields, only included when the field has a value
+USER_OPTIONAL_TMPL = {
+    'message': "💬 Message: {}\n",
+    'date': "📅 Date: {}\n",
+}
+
+ADMIN_OPTIONAL_TMPL = {
+    'message': "💬 *Message:* {}\n",
+    'date': "📅 *Date:* {}\n",
+}
+
+
+def format_optional_fields(templates: Dict[str, str], consultation_data: Dict[str, Any]) -> str:
+    """Render the optional field lines that are present in the consultation"""
+    return ''.join(
+        template.format(consultation_data[field])
+        for field, template in templates.items()
+        if consultation_data.get(field)
+    )
+
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /start is issued."""
+    user = update.effective_user
+    await update.message.reply_html(
+        START_TEXT.format(mention=user.mention_html()),
+        reply_markup=FORCE_REPLY,
+    )
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /help is issued."""
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
 
 
 async def get_consultations(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send the Excel file with all consultations (admin only)."""
-    chat_id = str(update.effective_chat.id)
-    user_id = str(update.effective_user.id)
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
     
     # Debug info
-    logger.info(f"get_consultations called - Chat ID: {chat_id}, User ID: {user_id}, Admin ID: {ADMIN_CHAT_ID}")
+    logger.info("get_consultations called - Chat ID: %s, User ID: %s, Admin ID: %s", chat_id, user_id, ADMIN_CHAT_ID)
     
     # Check if user is admin (check both user ID and chat ID for flexibility)
     if ADMIN_CHAT_ID and user_id != ADMIN_CHAT_ID and chat_id != ADMIN_CHAT_ID:
@@ -296,30 +526,27 @@ async def get_consultations(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     try:
-        excel_path = consultation_manager.get_excel_file_path()
-        
-        if not excel_path.exists():
-            await update.message.reply_text("📋 No consultations file found.")
-            return
+        # Build (or reuse) the Excel export off the event loop
+        loop = asyncio.get_running_loop()
+        document = await loop.run_in_executor(None, consultation_manager.get_xlsx_bytes)
         
         # Get consultation count
         count = consultation_manager.get_consultation_count()
-        logger.info(f"Excel file exists: {excel_path.exists()}, Consultation count: {count}")
+        logger.info("Exported %d consultations (%d bytes)", count, len(document))
         
         # Send the Excel file
-        with open(excel_path, 'rb') as file:
-            await update.message.reply_document(
-                document=file,
-                filename=f"consultations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                caption=f"📊 Consultations Export\n"
-                       f"Total consultations: {count}\n"
-                       f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            )
+        await update.message.reply_document(
+            document=document,
+            filename=f"consultations_{now_str('%Y%m%d_%H%M%S')}.xlsx",
+            caption=f"📊 Consultations Export\n"
+                   f"Total consultations: {count}\n"
+                   f"Generated: {now_str()}"
+        )
         
-        logger.info(f"Excel file sent to admin (Chat ID: {chat_id})")
+        logger.info("Excel file sent to admin (Chat ID: %s)", chat_id)
         
     except Exception as e:
-        logger.error(f"Error sending Excel file: {e}")
+        logger.error("Error sending Excel file: %s", e)
         await update.message.reply_text("❌ Error generating consultations file. Please try again later.")
 
 
@@ -334,20 +561,20 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 Total consultations: {count}
 Excel file: {excel_path.name}
-Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Last updated: {now_str()}
         """
         
         await update.message.reply_text(stats_text, parse_mode='Markdown')
         
     except Exception as e:
-        logger.error(f"Error getting stats: {e}")
+        logger.error("Error getting stats: %s", e)
         await update.message.reply_text("❌ Error retrieving statistics.")
 
 
 async def myid_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show user and chat IDs for admin setup."""
-    chat_id = str(update.effective_chat.id)
-    user_id = str(update.effective_user.id)
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
     user = update.effective_user
     chat = update.effective_chat
     
@@ -376,7 +603,10 @@ async def handle_consultation_message(update: Update, context: ContextTypes.DEFA
     """Handle incoming consultation request messages."""
     try:
         message_text = update.message.text
-        chat_id = str(update.effective_chat.id)
+        chat_id = update.effective_chat.id
+        
+        # One timestamp for the stored row and the admin notification
+        timestamp = now_str()
         
         # Parse the consultation data
         consultation_data = parse_consultation_message(message_text)
@@ -398,74 +628,100 @@ async def handle_consultation_message(update: Update, context: ContextTypes.DEFA
         # Add chat_id to consultation data
         consultation_data['chat_id'] = chat_id
         
-        # Add to Excel
-        logger.info(f"Processing consultation from chat {chat_id}: {consultation_data.get('name', 'Unknown')}")
-        success = consultation_manager.add_consultation(consultation_data)
-        
-        if success:
-            logger.info(f"Successfully added consultation to Excel")
-            # Send confirmation
-            name = consultation_data.get('name', 'Unknown')
-            response_text = f"✅ Consultation request received!\n\n"
-            response_text += f"👤 Patient: {name}\n"
-            response_text += f"📞 Phone: {consultation_data.get('phone', 'Not provided')}\n"
-            response_text += f"📧 Email: {consultation_data.get('email', 'Not provided')}\n"
-            
-            # Add optional fields if they exist
-            if consultation_data.get('message'):
-                response_text += f"💬 Message: {consultation_data.get('message')}\n"
-            if consultation_data.get('date'):
-                response_text += f"📅 Date: {consultation_data.get('date')}\n"
-            
-            response_text += f"\nYour request has been saved and our team will contact you soon!"
-            
-            await update.message.reply_text(response_text)
-            
-            # Notify admin if configured
-            if ADMIN_CHAT_ID and ADMIN_CHAT_ID != chat_id:
-                admin_notification = f"🔔 *New Consultation Request*\n\n"
-                admin_notification += f"👤 *Name:* {name}\n"
-                admin_notification += f"📞 *Phone:* {consultation_data.get('phone', 'Not provided')}\n"
-                admin_notification += f"📧 *Email:* {consultation_data.get('email', 'Not provided')}\n"
-                
-                # Add optional fields if they exist
-                if consultation_data.get('message'):
-                    admin_notification += f"💬 *Message:* {consultation_data.get('message')}\n"
-                if consultation_data.get('date'):
-                    admin_notification += f"� *Date:* {consultation_data.get('date')}\n"
-                
-                admin_notification += f"📱 *Chat ID:* {chat_id}\n"
-                admin_notification += f"⏰ *Time:* {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                
-                try:
-                    await context.bot.send_message(
-                        chat_id=ADMIN_CHAT_ID,
-                        text=admin_notification,
-                        parse_mode='Markdown'
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending admin notification: {e}")
-            
-        else:
+        # Fields shown in the log line, confirmation and admin notification
+        view = {
+            'name': consultation_data.get('name', 'Unknown'),
+            'phone': consultation_data.get('phone', 'Not provided'),
+            'email': consultation_data.get('email', 'Not provided'),
+            'chat_id': chat_id,
+            'timestamp': timestamp,
+        }
+        
+        # Add to the database
+        logger.info("Processing consultation from chat %s: %s", chat_id, view['name'])
+        success = await consultation_manager.submit(consultation_data, ts=timestamp)
+        
+        if not success:
             await update.message.reply_text(
                 "❌ Error processing your consultation request. Please try again later."
             )
+            return
+        
+        logger.info("Successfully added consultation to database")
+        
+        # Send confirmation
+        sends = [update.message.reply_text(USER_CONFIRM_TMPL.format(
+            optional=format_optional_fields(USER_OPTIONAL_TMPL, consultation_data),
+            **view
+        ))]
+        
+        # Notify admin if configured
+        if ADMIN_CHAT_ID and ADMIN_CHAT_ID != chat_id:
+            admin_notification = ADMIN_NOTIF_TMPL.format(
+                optional=format_optional_fields(ADMIN_OPTIONAL_TMPL, consultation_data),
+                **view
+            )
+            sends.append(context.bot.send_message(
+                chat_id=ADMIN_CHAT_ID,
+                text=admin_notification,
+                parse_mode='Markdown'
+            ))
+        
+        # Send both messages concurrently so the user doesn't wait on the admin
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for label, result in zip(("confirmation", "admin notification"), results):
+            if isinstance(result, Exception):
+                logger.error("Error sending %s: %s", label, result)
             
     except Exception as e:
-        logger.error(f"Error handling consultation message: {e}")
+        logger.error("Error handling consultation message: %s", e)
         await update.message.reply_text(
             "❌ An error occurred while processing your request. Please try again."
         )
 
 
+async def post_init(application: Application) -> None:
+    """Start the background consultation writer."""
+    consultation_manager.start_writer()
+
+
+async def post_shutdown(application: Application) -> None:
+    """Write queued consultations and close the database on exit."""
+    await consultation_manager.stop_writer()
+    consultation_manager.close()
+
+
 def main() -> None:
     """Start the bot."""
+    global consultation_manager
+    
     if not BOT_TOKEN:
         logger.error("BOT_TOKEN not found in environment variables")
-        return
+        sys.exit(1)
+    
+    # Initialize consultation manager
+    consultation_manager = ConsultationManager(EXCEL_FILE_PATH)
+    atexit.register(consultation_manager.close)
+    
+    # Use the libuv-based event loop when available (not supported on Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
     
     # Create the Application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # Handle updates concurrently so bursts of consultations reach the
+        # background writer together and are stored in one batch
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Register handlers
     application.add_handler(CommandHandler("start", start))
@@ -481,11 +737,12 @@ def main() -> None:
     if WEBHOOK_URL:
         # Cloud hosting mode with webhooks
         logger.info("Starting AuraDent Bot in webhook mode...")
+        webhook_path = f"/{BOT_TOKEN}"
         application.run_webhook(
             listen="0.0.0.0",
             port=PORT,
-            webhook_url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
-            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL}{webhook_path}",
+            url_path=webhook_path,
             allowed_updates=Update.ALL_TYPES
         )
     else:
@@ -19,6 +19,9 @@ def test_imports():
         import dotenv
         print("✅ python-dotenv imported successfully")
         
+        import orjson
+        print("✅ orjson imported successfully")
+        
         return True
     except ImportError as e:
         print(f"❌ Import error: {e}")